@@ -0,0 +1,93 @@
+"""Startup-time benchmark for filter.py
+
+Runs each command in a fresh interpreter several times and reports wall
+time, with and without the startup snapshot, then lists the slowest imports
+from `python -X importtime` so regressions in cold-start latency show up.
+
+    python bench_startup.py [--runs N] [--top N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from filter import SNAPSHOT_FILE
+
+COMMANDS = [
+    ("help", ["--help"]),
+    ("single spell", ["--class", "wizard", "--level", "5", "-n", "fireball"]),
+    ("class filter", ["--class", "wizard", "--level", "5"]),
+    ("character", []),
+]
+
+
+def time_command(argv, runs: int) -> list:
+    """Wall-clock seconds for each of `runs` fresh runs of filter.py"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "filter.py", *argv],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def slowest_imports(argv, top: int) -> list:
+    """(cumulative microseconds, module) for the slowest imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "filter.py", *argv],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def remove_snapshot():
+    try:
+        os.remove(SNAPSHOT_FILE)
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filter.py startup")
+    parser.add_argument("--runs", type=int, default=10, help="runs per command")
+    parser.add_argument("--top", type=int, default=10, help="imports to list")
+    args = parser.parse_args()
+
+    # Build the snapshot up front so the "snapshot" column is a warm start
+    remove_snapshot()
+    time_command(["--class", "wizard", "--level", "5"], 1)
+
+    print(f"{'Command':<15}{'no snapshot (ms)':>18}{'snapshot (ms)':>16}")
+    print("-" * 49)
+    for label, argv in COMMANDS:
+        cold = time_command([*argv, "--no-snapshot"], args.runs)
+        warm = time_command(argv, args.runs)
+        print(
+            f"{label:<15}{statistics.median(cold) * 1000:>18.1f}"
+            f"{statistics.median(warm) * 1000:>16.1f}"
+        )
+
+    print(f"\nSlowest imports for '{' '.join(COMMANDS[2][1])}' (cumulative us):")
+    for cumulative, module in slowest_imports(COMMANDS[2][1], args.top):
+        print(f"{cumulative:>10}  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,329 @@
 # filter for concentration / no concentration
 # filter for damage, healing, buffing, debuffing
 # sort by: range?
+
+"""Character session state: spell slots, concentration and hit points"""
+
+import json
+import re
+import sys
+from typing import Dict, Iterable, List, Set
+
+
+def get_spell_slots(character, classes_data) -> Dict[int, int]:
+    """Maximum spell slots per spell level for the character's class and level"""
+    for class_data in classes_data:
+        if class_data["class"].lower() == character["class"].lower():
+            level_data = class_data["levels"].get(str(character["level"]), {})
+            slots = {}
+            for slot_level_str, count in level_data.get("spell_slots", {}).items():
+                try:
+                    slots[int(slot_level_str)] = count
+                except ValueError:
+                    continue  # Skip non-numeric keys
+            return slots
+    return {}
+
+
+def session_log_file(character) -> str:
+    """Default event log filename for a character"""
+    slug = re.sub(r"[^a-z0-9]+", "_", character["name"].lower()).strip("_")
+    return f"{slug}.session.jsonl"
+
+
+class CharacterSession:
+    """
+    Slot, concentration and HP state for one character over a session.
+
+    `castable` is the set of spell ids the character can cast right now
+    without dropping concentration: they must be conscious, a leveled spell
+    needs a remaining slot of its level or higher, and concentration spells
+    are left out while already concentrating. Spells are bucketed by
+    (level, concentration) so each state change only adds or removes the
+    buckets whose availability actually changed.
+
+    Every change is appended to a JSONL event log, and replaying the log
+    restores the session.
+    """
+
+    def __init__(
+        self,
+        character: dict,
+        classes_data: List[dict],
+        spells: List[dict],
+        spell_ids: Iterable[int],
+        log_file: str = None,
+    ):
+        self.character = character
+        self.spells = spells
+        self.max_slots = get_spell_slots(character, classes_data)
+        self.log_file = log_file
+        self.log_needs_newline = False  # log ends in a truncated line
+
+        self.buckets: Dict[tuple, Set[int]] = {}
+        for spell_id in spell_ids:
+            spell = spells[spell_id]
+            key = (spell.get("level", 0), bool(spell.get("concentration")))
+            self.buckets.setdefault(key, set()).add(spell_id)
+
+        self.reset()
+        if log_file:
+            self.replay(log_file)
+        self.castable = self.castable_from_scratch()
+
+    def reset(self):
+        """State at the start of the session, with HP from characters.json"""
+        self.long_rest()
+        self.cur_hp = self.character.get("cur_hp", self.max_hp)
+
+    def long_rest(self):
+        """Full slots and HP, not concentrating"""
+        self.slots = dict(self.max_slots)
+        self.max_hp = self.character.get("max_hp", 0)
+        self.cur_hp = self.max_hp
+        self.concentrating_on = None
+
+    # State queries
+
+    def highest_slot(self) -> int:
+        """Highest spell level with a slot left (0 if none)"""
+        return max((level for level, n in self.slots.items() if n > 0), default=0)
+
+    def active_buckets(self) -> Set[tuple]:
+        """Bucket keys whose spells are castable in the current state"""
+        if self.cur_hp <= 0:
+            return set()
+        highest = self.highest_slot()
+        return {
+            (level, concentration)
+            for level, concentration in self.buckets
+            if level <= highest and not (concentration and self.concentrating_on)
+        }
+
+    def castable_from_scratch(self) -> Set[int]:
+        castable = set()
+        for key in self.active_buckets():
+            castable |= self.buckets[key]
+        return castable
+
+    def is_castable(self, spell_id: int) -> bool:
+        return spell_id in self.castable
+
+    # Events
+
+    def apply(self, event: dict):
+        """Update slots, HP and concentration for one event"""
+        kind = event["type"]
+        if kind == "cast":
+            if event.get("slot_level"):
+                self.expend_slot_state(event["slot_level"])
+            if event.get("concentration"):
+                self.concentrating_on = event["spell"]
+        elif kind == "expend_slot":
+            self.expend_slot_state(event["level"])
+        elif kind == "restore_slot":
+            level = event["level"]
+            self.slots[level] = min(
+                self.slots.get(level, 0) + 1, self.max_slots.get(level, 0)
+            )
+        elif kind == "concentrate":
+            self.concentrating_on = event["spell"]
+        elif kind == "end_concentration":
+            self.concentrating_on = None
+        elif kind == "damage":
+            self.cur_hp = max(self.cur_hp - event["amount"], 0)
+            if self.cur_hp == 0:
+                self.concentrating_on = None
+        elif kind == "heal":
+            self.cur_hp = min(self.cur_hp + event["amount"], self.max_hp)
+        elif kind == "long_rest":
+            self.long_rest()
+        else:
+            raise ValueError(f"Unknown session event: {kind}")
+
+    def expend_slot_state(self, level: int):
+        if self.slots.get(level, 0) <= 0:
+            raise ValueError(f"No level {level} spell slots left")
+        self.slots[level] -= 1
+
+    def record(self, event: dict):
+        """Apply an event, update `castable` incrementally and log it"""
+        before = self.active_buckets()
+        self.apply(event)
+        after = self.active_buckets()
+
+        for key in before - after:
+            self.castable -= self.buckets[key]
+        for key in after - before:
+            self.castable |= self.buckets[key]
+
+        if self.log_file:
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                if self.log_needs_newline:
+                    f.write("\n")
+                    self.log_needs_newline = False
+                f.write(json.dumps(event) + "\n")
+
+    def replay(self, log_file: str):
+        """
+        Apply every event in a log; `castable` is rebuilt once afterwards.
+        Lines that can't be applied are skipped with a warning: a write cut
+        short by a crash, a malformed event, or one that no longer fits the
+        character (e.g. a slot they've lost since characters.json changed).
+        """
+        try:
+            with open(log_file, "r", encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    self.log_needs_newline = not line.endswith("\n")
+                    try:
+                        self.apply(json.loads(line))
+                    except KeyError as e:
+                        print(
+                            f"Warning: skipping line {line_number} of {log_file}: "
+                            f"missing {e}"
+                        )
+                    except (TypeError, ValueError) as e:
+                        print(
+                            f"Warning: skipping line {line_number} of {log_file}: {e}"
+                        )
+        except FileNotFoundError:
+            pass
+
+    def cast(self, spell_id: int, slot_level: int = None):
+        """
+        Cast a spell, using the lowest suitable slot unless one is given.
+        Casting a concentration spell while concentrating ends the current
+        one first (logged as end_concentration), which is why `castable`
+        leaves those spells out.
+        """
+        spell = self.spells[spell_id]
+        level = spell.get("level", 0)
+        name = self.character["name"]
+        if not any(spell_id in ids for ids in self.buckets.values()):
+            raise ValueError(f"{name} doesn't have {spell['title']} prepared")
+        highest = max(self.max_slots, default=0)
+        if level > highest:
+            raise ValueError(
+                f"{spell['title']} is level {level} but {name}'s highest spell "
+                f"slot is level {highest}"
+            )
+        if self.cur_hp <= 0:
+            raise ValueError(f"{name} is unconscious")
+        if level > 0 and slot_level is None:
+            slot_level = min(
+                (n for n, count in self.slots.items() if n >= level and count > 0),
+                default=None,
+            )
+            if slot_level is None:
+                raise ValueError(f"No spell slots left for {spell['title']}")
+        if level > 0 and slot_level < level:
+            raise ValueError(f"{spell['title']} needs a level {level} slot or higher")
+        if spell.get("concentration") and self.concentrating_on:
+            self.record({"type": "end_concentration"})
+        self.record(
+            {
+                "type": "cast",
+                "spell": spell["title"],
+                "slot_level": slot_level if level > 0 else None,
+                "concentration": bool(spell.get("concentration")),
+            }
+        )
+
+    def status_lines(self) -> List[str]:
+        slots = ", ".join(
+            f"{level}: {self.slots.get(level, 0)}/{count}"
+            for level, count in sorted(self.max_slots.items())
+        )
+        return [
+            f"{self.character['name']}: {self.cur_hp}/{self.max_hp} HP",
+            f"Spell slots: {slots if slots else 'none'}",
+            f"Concentrating on: {self.concentrating_on or '-'}",
+            f"Castable now: {len(self.castable)} spells",
+        ]
+
+
+def open_session(character, snapshot, spell_ids, log_file=None) -> CharacterSession:
+    """Session for a character, restored from its event log"""
+    return CharacterSession(
+        character,
+        snapshot.classes,
+        snapshot.spells,
+        spell_ids,
+        log_file if log_file else session_log_file(character),
+    )
+
+
+def main():
+    import argparse
+
+    from filter import open_store, select_character
+
+    parser = argparse.ArgumentParser(description="Track a character's session")
+    parser.add_argument("-f", "--file", type=str, help="load character.json")
+    parser.add_argument("--log", type=str, help="session event log (JSONL)")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("status", help="show slots, HP and concentration")
+    cast = sub.add_parser("cast", help="cast a spell")
+    cast.add_argument("spell", type=str)
+    cast.add_argument("--slot", type=int, help="slot level (default: lowest)")
+    concentrate = sub.add_parser("concentrate", help="start concentrating")
+    concentrate.add_argument("spell", type=str)
+    sub.add_parser("drop", help="end concentration")
+    damage = sub.add_parser("damage", help="take damage")
+    damage.add_argument("amount", type=int)
+    heal = sub.add_parser("heal", help="regain hit points")
+    heal.add_argument("amount", type=int)
+    sub.add_parser("long-rest", help="restore slots and HP")
+    args = parser.parse_args()
+
+    snapshot = open_store(args.file if args.file else "characters.json").snapshot
+    character = select_character(snapshot.characters)
+    if not character:
+        sys.exit(0)
+
+    name_index = snapshot.name_index
+    spell_ids, _ = name_index.resolve(character.get("prepared_spells", []))
+    try:
+        session = open_session(character, snapshot, spell_ids, args.log)
+    except ValueError as e:
+        print(f"Can't restore {character['name']}'s session: {e}")
+        sys.exit(1)
+
+    def find_spell(title):
+        spell_id = name_index.lookup(title)
+        if spell_id is None:
+            suggestions = name_index.suggest(title)
+            hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+            print(f"No spell named '{title}'.{hint}")
+            sys.exit(1)
+        return spell_id
+
+    try:
+        if args.command == "cast":
+            concentrating_on = session.concentrating_on
+            session.cast(find_spell(args.spell), args.slot)
+            if concentrating_on and session.concentrating_on != concentrating_on:
+                print(f"Stopped concentrating on {concentrating_on}")
+        elif args.command == "concentrate":
+            title = snapshot.spells[find_spell(args.spell)]["title"]
+            session.record({"type": "concentrate", "spell": title})
+        elif args.command == "drop":
+            session.record({"type": "end_concentration"})
+        elif args.command == "damage":
+            session.record({"type": "damage", "amount": args.amount})
+        elif args.command == "heal":
+            session.record({"type": "heal", "amount": args.amount})
+        elif args.command == "long-rest":
+            session.record({"type": "long_rest"})
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    for line in session.status_lines():
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
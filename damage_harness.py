@@ -0,0 +1,246 @@
+"""Golden-output and throughput harness for the damage parser
+
+Snapshot what parse_spell_damage returns for every spell in spells.json at
+several spellcasting modifiers, then check any alternate implementation
+against that snapshot and compare throughput side by side.
+
+    python damage_harness.py snapshot
+    python damage_harness.py check
+    python damage_harness.py check --impl fast_damage:parse_spell_damage
+
+An implementation is any function with parse_spell_damage's signature,
+(description, spellcasting_mod) -> dict, named as module:function.
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+from filter import format_damage_columns, get_spells_json, parse_spell_damage
+
+GOLDEN_FILE = "damage_golden.json"
+MODIFIERS = [-1, 0, 3, 5]
+
+# Order of the values stored per spell and modifier in the golden file
+FIELDS = [
+    "primary_damage",
+    "ongoing_damage",
+    "primary_healing",
+    "ongoing_healing",
+    "total_damage",
+    "total_healing",
+    "damage_types",
+]
+COLUMNS = ["Dmg", "Ongoing", "Heal", "H.Ongoing", "Total", "Types"]
+
+
+def description_hash(description: str) -> str:
+    return hashlib.sha1((description or "").encode("utf-8")).hexdigest()[:12]
+
+
+def load_impl(name: str) -> Callable[[str, int], Dict]:
+    """Import an implementation given as module:function"""
+    module_name, _, function_name = name.partition(":")
+    if not function_name:
+        raise ValueError(f"Expected module:function, got '{name}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def result_row(result: Dict) -> List:
+    return [result[field] for field in FIELDS]
+
+
+def take_snapshot(spells: List[dict], parse) -> Dict:
+    """Record parser output for every spell at every modifier"""
+    golden = {"modifiers": MODIFIERS, "spells": {}}
+    for spell in spells:
+        description = spell.get("description", "")
+        golden["spells"][spell["title"]] = {
+            "description": description_hash(description),
+            "results": [result_row(parse(description, mod)) for mod in MODIFIERS],
+        }
+    return golden
+
+
+def write_golden(golden: Dict, filename: str):
+    """
+    Write the snapshot with one line per spell and modifier, so a change to
+    the parser shows up as a readable diff of the rows it affects
+    """
+
+    def dump(value) -> str:
+        return json.dumps(value, ensure_ascii=False)
+
+    entries = []
+    for title, entry in golden["spells"].items():
+        rows = ",\n".join(f"   {dump(row)}" for row in entry["results"])
+        entries.append(
+            f'  {dump(title)}: {{"description": {dump(entry["description"])}, '
+            f'"results": [\n{rows}\n  ]}}'
+        )
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(f'{{\n "modifiers": {dump(golden["modifiers"])},\n "spells": {{\n')
+        f.write(",\n".join(entries))
+        f.write("\n }\n}\n")
+
+
+def row_diff(expected: List, actual: List) -> List[str]:
+    """Human-readable differences between two result rows"""
+    expected_data = dict(zip(FIELDS, expected))
+    actual_data = dict(zip(FIELDS, actual))
+    diffs = []
+    for field in FIELDS:
+        want, got = expected_data[field], actual_data[field]
+        if field == "damage_types":
+            if list(want) != list(got):
+                diffs.append(f"{field}: {want} -> {got}")
+        elif abs(want - got) > 1e-9:
+            diffs.append(f"{field}: {want} -> {got}")
+
+    # Show the formatted columns too, since that's what users see
+    want_columns = format_damage_columns(expected_data)
+    got_columns = format_damage_columns(actual_data)
+    for column, want, got in zip(COLUMNS, want_columns, got_columns):
+        if want != got:
+            diffs.append(f"[{column}] {want} -> {got}")
+    return diffs
+
+
+def check(spells: List[dict], golden: Dict, parse, max_diffs: int) -> tuple:
+    """
+    Compare a parser against the golden snapshot. Returns (mismatches,
+    skipped): spells whose output differs, and spells that couldn't be
+    compared because they're new, changed or gone since the snapshot.
+    """
+    modifiers = golden["modifiers"]
+    mismatches = 0
+    stale = 0
+    for spell in spells:
+        expected = golden["spells"].get(spell["title"])
+        description = spell.get("description", "")
+        if expected is None or expected["description"] != description_hash(description):
+            stale += 1
+            continue
+
+        spell_diffs = []
+        for mod, want in zip(modifiers, expected["results"]):
+            for diff in row_diff(want, result_row(parse(description, mod))):
+                spell_diffs.append(f"    mod {mod:+d}: {diff}")
+        if spell_diffs:
+            mismatches += 1
+            if mismatches <= max_diffs:
+                print(f"  {spell['title']}")
+                print("\n".join(spell_diffs))
+
+    if mismatches > max_diffs:
+        print(f"  ... and {mismatches - max_diffs} more spells")
+    if stale:
+        print(
+            f"  {stale} spells are new or changed since the snapshot and were skipped"
+        )
+    titles = {spell["title"] for spell in spells}
+    missing = [title for title in golden["spells"] if title not in titles]
+    if missing:
+        shown = ", ".join(missing[:max_diffs])
+        more = (
+            f" and {len(missing) - max_diffs} more" if len(missing) > max_diffs else ""
+        )
+        print(
+            f"  {len(missing)} spells in the snapshot are missing from "
+            f"spells.json: {shown}{more}"
+        )
+    return mismatches, stale + len(missing)
+
+
+def throughput(spells: List[dict], parse, modifiers: List[int], repeat: int):
+    """Best-of-`repeat` descriptions parsed per second"""
+    descriptions = [spell.get("description", "") for spell in spells]
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for mod in modifiers:
+            for description in descriptions:
+                parse(description, mod)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(descriptions) * len(modifiers) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Damage parser golden harness")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("snapshot", help=f"write {GOLDEN_FILE} from parse_spell_damage")
+    check_parser = sub.add_parser("check", help=f"compare against {GOLDEN_FILE}")
+    check_parser.add_argument(
+        "--impl",
+        action="append",
+        help="implementation to check, as module:function (repeatable)",
+    )
+    check_parser.add_argument(
+        "--repeat", type=int, default=3, help="throughput runs (best is kept)"
+    )
+    check_parser.add_argument(
+        "--max-diffs", type=int, default=20, help="spells to show diffs for"
+    )
+    args = parser.parse_args()
+
+    spells = get_spells_json()
+
+    if args.command == "snapshot":
+        golden = take_snapshot(spells, parse_spell_damage)
+        write_golden(golden, GOLDEN_FILE)
+        print(f"Wrote {len(golden['spells'])} spells x {len(MODIFIERS)} modifiers")
+        return
+
+    try:
+        with open(GOLDEN_FILE, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+    except FileNotFoundError:
+        print(f"No {GOLDEN_FILE}; run `python damage_harness.py snapshot` first")
+        sys.exit(1)
+
+    impls = {"filter:parse_spell_damage": parse_spell_damage}
+    for name in args.impl or []:
+        try:
+            impls[name] = load_impl(name)
+        except (ImportError, AttributeError, ValueError) as e:
+            print(f"Can't load {name}: {e}")
+            sys.exit(1)
+
+    results = []
+    for name, parse in impls.items():
+        print(f"{name}:")
+        mismatches, skipped = check(spells, golden, parse, args.max_diffs)
+        if not mismatches and not skipped:
+            print("  matches snapshot")
+        rate = throughput(spells, parse, golden["modifiers"], args.repeat)
+        results.append((name, mismatches, skipped, rate))
+
+    print()
+    name_width = max(len(name) for name, _, _, _ in results)
+    print(
+        f"{'Implementation'.ljust(name_width)}   Mismatches   Skipped   "
+        "Descriptions/sec"
+    )
+    print("-" * (name_width + 45))
+    for name, mismatches, skipped, rate in results:
+        print(
+            f"{name.ljust(name_width)}   {mismatches:<10d}   {skipped:<7d}   "
+            f"{rate:,.0f}"
+        )
+
+    if any(skipped for _, _, skipped, _ in results):
+        print(
+            f"\n{GOLDEN_FILE} is out of date; review the skipped spells and run "
+            "`python damage_harness.py snapshot`"
+        )
+    if any(mismatches or skipped for _, mismatches, skipped, _ in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
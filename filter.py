@@ -1,10 +1,11 @@
 """Filter utility for spells with damage/healing parsing"""
 
-import json
-import argparse
 import sys
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, List, Set, Tuple
+
+# json, argparse and the spell_* modules are imported where they're used,
+# so `--help` and other short paths don't pay for them at startup
 
 SPELLCASTING_ABILITIES = {
     "paladin": "charisma",
@@ -69,31 +70,14 @@ def parse_dice_expression(expr: str, spellcasting_mod: int = 0) -> float:
 
 
 def extract_damage_types(text: str) -> List[str]:
-    """Extract damage types from spell description."""
-    damage_types = [
-        "acid",
-        "bludgeoning",
-        "cold",
-        "fire",
-        "force",
-        "lightning",
-        "necrotic",
-        "piercing",
-        "poison",
-        "psychic",
-        "radiant",
-        "slashing",
-        "thunder",
-    ]
-
-    found_types = []
-    text_lower = text.lower()
-
-    for damage_type in damage_types:
-        if damage_type in text_lower:
-            found_types.append(damage_type)
+    """
+    Extract damage types from spell description.
+    Matches whole words followed by "damage" (or a list of damage type
+    choices), so "fire" in "set fire to" doesn't count.
+    """
+    from spell_tags import find_damage_types
 
-    return list(set(found_types))  # Remove duplicates
+    return find_damage_types(text)
 
 
 def find_damage_expressions(text: str) -> List[Tuple[str, str, bool, bool]]:
@@ -168,6 +152,32 @@ def find_damage_expressions(text: str) -> List[Tuple[str, str, bool, bool]]:
     return expressions
 
 
+def analyze_description(description: str) -> Dict:
+    """
+    Extract the modifier-independent parts of a spell description:
+    damage types and damage/healing expressions.
+    """
+    if not description:
+        return {"damage_types": [], "expressions": []}
+
+    return {
+        "damage_types": extract_damage_types(description),
+        "expressions": find_damage_expressions(description),
+    }
+
+
+def analyze_spell(spell: dict) -> Dict:
+    """Per-spell analysis kept by the SpellStore"""
+    return analyze_description(spell.get("description") or "")
+
+
+def tag_spell(spell: dict, analysis: Dict) -> Dict:
+    """Tags for a spell, given its analyze_spell output"""
+    from spell_tags import tag_description
+
+    return tag_description(spell.get("description") or "", analysis)
+
+
 def parse_spell_damage(description: str, spellcasting_mod: int = 0) -> Dict:
     """
     Parse spell description for damage and healing values.
@@ -181,6 +191,11 @@ def parse_spell_damage(description: str, spellcasting_mod: int = 0) -> Dict:
     - total_healing: float
     - damage_types: List[str]
     """
+    return damage_from_analysis(analyze_description(description), spellcasting_mod)
+
+
+def damage_from_analysis(analysis: Dict, spellcasting_mod: int = 0) -> Dict:
+    """Work out damage and healing values from analyze_description output"""
     result = {
         "primary_damage": 0.0,
         "ongoing_damage": 0.0,
@@ -188,19 +203,10 @@ def parse_spell_damage(description: str, spellcasting_mod: int = 0) -> Dict:
         "ongoing_healing": 0.0,
         "total_damage": 0.0,
         "total_healing": 0.0,
-        "damage_types": [],
+        "damage_types": list(analysis["damage_types"]),
     }
 
-    if not description:
-        return result
-
-    # Extract damage types
-    result["damage_types"] = extract_damage_types(description)
-
-    # Find all damage/healing expressions
-    expressions = find_damage_expressions(description)
-
-    for expr, context, is_damage, is_ongoing in expressions:
+    for expr, context, is_damage, is_ongoing in analysis["expressions"]:
         value = parse_dice_expression(expr, spellcasting_mod)
 
         if is_damage:
@@ -266,12 +272,16 @@ def get_spellcasting_modifier(character):
 
 def get_spells_json(filename="spells.json"):
     """Get spells from JSON file"""
+    import json
+
     with open(filename, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
 def get_characters_json(filename="characters.json"):
     """Get characters from JSON file"""
+    import json
+
     try:
         with open(filename, "r", encoding="utf-8") as f:
             return json.load(f)
@@ -281,6 +291,8 @@ def get_characters_json(filename="characters.json"):
 
 def get_classes_json(filename="classes.json"):
     """Get class data from JSON file"""
+    import json
+
     try:
         with open(filename, "r", encoding="utf-8") as f:
             return json.load(f)
@@ -357,92 +369,143 @@ def select_character(characters):
             print("Please enter a valid number.")
 
 
-spells = get_spells_json()
-
-parser = argparse.ArgumentParser(description="Filter D&D Spells")
-
-parser.add_argument("--class", dest="char_class", type=str, help="class")
-parser.add_argument("--level", type=int, help="spell level")
-parser.add_argument("-nc", "--noncombat", action="store_true", help="non-combat spells")
-parser.add_argument(
-    "-nc1",
-    "--noncombat-minute",
-    action="store_true",
-    help="1 min cast non-combat spells",
-)
-parser.add_argument(
-    "-c", "--combat", action="store_true", help="combat casting time spells"
-)
-parser.add_argument("-f", "--file", type=str, help="load character.json")
-parser.add_argument("-r", "--range", type=int, help="filter by minimum range in feet")
-parser.add_argument(
-    "-s",
-    "--sort",
-    choices=["name", "level", "school", "range", "damage", "healing"],
-    default="name",
-    help="sort by name, level, school, range, damage, or healing",
-)
-parser.add_argument(
-    "-u",
-    "--unprepared",
-    action="store_true",
-    help="include unprepared spells (default: prepared only)",
-)
-
-args = parser.parse_args()
-
-# Load character data if needed
+SNAPSHOT_FILE = "spells.snapshot.pickle"
+
+# Set up by main(); everything below reads from the current snapshot
+args = None
+store = None
+snapshot = None
+spells = []
+name_index = None
+classes_data = []
 character = None
 spellcasting_mod = 0
-classes_data = get_classes_json()
+prepared_ids = set()
+extra_ids = set()
+name_ids = None
+where_predicate = None
+castable_ids = None
+tag_ids = None
+
+
+def open_store(characters_file: str, snapshot_file: str = SNAPSHOT_FILE):
+    """Load the data files, from the startup snapshot when it's current"""
+    from spell_store import CHARACTERS, CLASSES, SPELLS, SpellStore
+
+    return SpellStore(
+        {
+            SPELLS: ("spells.json", get_spells_json),
+            CLASSES: ("classes.json", get_classes_json),
+            CHARACTERS: (characters_file, get_characters_json),
+        },
+        analyze_spell,
+        tag_spell,
+        snapshot_file,
+    )
+
+
+def use_character(char) -> int:
+    """Apply a character's class, level and spell lists to the filters"""
+    global spellcasting_mod, prepared_ids, extra_ids
+    from spell_index import report_unknown_spells
+
+    args.char_class = char["class"]
+
+    # Determine max spell level from class progression
+    max_spell_level = get_max_spell_level(char, classes_data)
+    args.level = max_spell_level
+
+    spellcasting_mod = get_spellcasting_modifier(char)
+
+    # Resolve spell names once so typos are reported instead of dropped
+    prepared_ids, unknown = name_index.resolve(char.get("prepared_spells", []))
+    report_unknown_spells(unknown, f"{char['name']}'s prepared_spells")
+    extra_ids, unknown = name_index.resolve(char.get("extra_spells", []))
+    report_unknown_spells(unknown, f"{char['name']}'s extra_spells")
+
+    return max_spell_level
+
+
+def castable_spells(char) -> Set[int]:
+    """Ids of the character's prepared spells castable in its current session"""
+    from character import open_session
+
+    return open_session(char, snapshot, prepared_ids).castable
 
-if not args.char_class and not args.level:
-    # Load characters.json by default if no class/level specified
-    characters_file = args.file if args.file else "characters.json"
-    characters = get_characters_json(characters_file)
-    character = select_character(characters)
+
+def apply_snapshot(new_snapshot):
+    """Switch the filters over to a (re)loaded snapshot"""
+    global snapshot, spells, name_index, classes_data, character
+    global name_ids, tag_ids, castable_ids
+    snapshot = new_snapshot
+    spells = snapshot.spells
+    name_index = snapshot.name_index
+    classes_data = snapshot.classes
 
     if character:
-        args.char_class = character["class"]
+        for char in snapshot.characters:
+            if char["name"] == character["name"]:
+                character = char
+                use_character(character)
+                break
+
+    if args.name:
+        name_ids = set(name_index.complete(args.name))
+    if args.tag or args.save:
+        tag_index = snapshot.analysis.tag_index()
+        tag_ids = tag_index.select(args.tag or [], args.save or [])
+    if args.castable and castable_ids is not None:
+        refresh_castable()
+
+
+def refresh_castable():
+    """Re-read the session log; keep the old castable set if it can't load"""
+    global castable_ids
+    try:
+        castable_ids = castable_spells(character)
+    except ValueError as e:
+        print(f"Can't restore {character['name']}'s session: {e}")
 
-        # Determine max spell level from class progression
-        max_spell_level = get_max_spell_level(character, classes_data)
-        args.level = max_spell_level
 
-        spellcasting_mod = get_spellcasting_modifier(character)
-        print(
-            f"Using character: {character['name']} ({character['class']} {character['level']}, +{spellcasting_mod} spell mod, max spell level {max_spell_level})"
-        )
-    else:
-        print("No character selected. Use --help to see filtering options.")
-        sys.exit(0)
-elif args.char_class and args.level is not None:
-    # Manual class/level specified - still check if they can cast spells
-    fake_character = {"class": args.char_class, "level": args.level}
-    max_spell_level = get_max_spell_level(fake_character, classes_data)
+def get_spell_analysis(spell: dict) -> Dict:
+    """Cached analysis for a spell from the current snapshot"""
+    return snapshot.analysis.get(spell)
 
-    # Update the level filter to the actual max castable level
-    original_level = args.level
-    args.level = max_spell_level
 
-    if max_spell_level == -1:
-        print(f"Using {args.char_class} level {original_level}: no spellcasting")
-    elif max_spell_level == 0:
-        print(f"Using {args.char_class} level {original_level}: cantrips only")
-    else:
-        print(
-            f"Using {args.char_class} level {original_level}: max spell level {max_spell_level}"
-        )
+def get_spell_tags(spell: dict) -> Dict:
+    """Cached tags for a spell from the current snapshot"""
+    return snapshot.analysis.tags(spell)
 
-    if max_spell_level == -1:
-        print(f"{args.char_class} level {original_level} cannot cast any spells")
-        print("No spells matched the filters.")
-        sys.exit(0)
-elif args.char_class or args.level is not None:
-    print(
-        "Both --class and --level must be specified together, or use character selection."
+
+def spell_damage(spell: dict) -> Dict:
+    """Damage and healing values for a spell at the current spell mod"""
+    return damage_from_analysis(get_spell_analysis(spell), spellcasting_mod)
+
+
+def spell_classes(spell: dict) -> List[str]:
+    """Class names that have this spell on their list"""
+    return [
+        key[len("class_") :].removesuffix("_optional")
+        for key, value in spell.items()
+        if key.startswith("class_") and value
+    ]
+
+
+def query_fields(spells) -> Dict:
+    """Fields available to --where: every spell key plus derived values"""
+    from spell_query import LIST, NUMBER, QueryField, spell_schema
+
+    fields = spell_schema(spells)
+    fields["range_feet"] = QueryField(NUMBER, lambda s: get_range_for_sorting(s))
+    fields["damage_type"] = QueryField(
+        LIST, lambda s: get_spell_analysis(s)["damage_types"]
     )
-    sys.exit(1)
+    fields["classes"] = QueryField(LIST, spell_classes)
+    fields["condition"] = QueryField(LIST, lambda s: get_spell_tags(s)["conditions"])
+    fields["save"] = QueryField(LIST, lambda s: get_spell_tags(s)["saves"])
+    fields["category"] = QueryField(LIST, lambda s: get_spell_tags(s)["categories"])
+    return fields
+
 
 display_labels = {
     "casting_time_noncombat": "Casting Time:",
@@ -574,8 +637,7 @@ def format_title_line(
         tag_part = ""
 
     # Parse damage for this spell
-    description = spell.get("description", "")
-    damage_data = parse_spell_damage(description, spellcasting_mod)
+    damage_data = spell_damage(spell)
     dmg, ongoing, heal, h_ongoing, total, types = format_damage_columns(damage_data)
 
     # Format with padding
@@ -624,19 +686,26 @@ def class_keys(char_class):
     return [f"class_{char_class.lower()}", f"class_{char_class.lower()}_optional"]
 
 
-def is_selected(spell):
+def is_selected(spell_id, spell):
     """Do we select this spell for inclusion?"""
+    if name_ids is not None and spell_id not in name_ids:
+        return False
+    if castable_ids is not None and spell_id not in castable_ids:
+        return False
+    if tag_ids is not None and spell_id not in tag_ids:
+        return False
     if args.char_class:
         keys = class_keys(args.char_class)
         spell_available = any(spell.get(k, False) for k in keys)
 
         # Also check if it's in the character's extra spells
         if not spell_available and character:
-            extra_spells = character.get("extra_spells", [])
-            spell_available = spell.get("title") in extra_spells
+            spell_available = spell_id in extra_ids
 
         if not spell_available:
             return False
+    if where_predicate and not where_predicate(spell):
+        return False
     if args.level is not None:
         level = spell.get("level")
         if level > args.level:
@@ -647,8 +716,7 @@ def is_selected(spell):
             return False
     # Default to prepared spells only, unless -u flag is used
     if not args.unprepared and character:
-        prepared_spells = character.get("prepared_spells", [])
-        if spell.get("title") not in prepared_spells:
+        if spell_id not in prepared_ids:
             return False
     if args.noncombat:
         for nc in ["casting_time_noncombat", "casting_time_noncombat_unit"]:
@@ -670,7 +738,7 @@ def is_selected(spell):
 
 def get_damage_sort_key(spell: dict) -> tuple:
     """Get sorting key for damage: return combined total value for sorting"""
-    damage_data = parse_spell_damage(spell.get("description", ""), spellcasting_mod)
+    damage_data = spell_damage(spell)
     total_damage = damage_data["total_damage"]
     total_healing = damage_data["total_healing"]
 
@@ -683,7 +751,7 @@ def get_damage_sort_key(spell: dict) -> tuple:
 
 def get_healing_sort_key(spell: dict) -> tuple:
     """Get sorting key for healing: return combined total value for sorting"""
-    damage_data = parse_spell_damage(spell.get("description", ""), spellcasting_mod)
+    damage_data = spell_damage(spell)
     total_damage = damage_data["total_damage"]
     total_healing = damage_data["total_healing"]
 
@@ -723,8 +791,8 @@ def sort_spells(filtered_spells, sort_by):
 def filter_spells():
     """get list of spells matching filter"""
     filtered_spells = []
-    for spell in spells:
-        if is_selected(spell):
+    for spell_id, spell in enumerate(spells):
+        if is_selected(spell_id, spell):
             filtered_spells.append(spell)
     return sort_spells(filtered_spells, args.sort)
 
@@ -742,8 +810,7 @@ def output_spells(filtered_spells: list):
     # Calculate damage column widths by processing all spells
     damage_data_list = []
     for spell in filtered_spells:
-        description = spell.get("description", "")
-        damage_data = parse_spell_damage(description, spellcasting_mod)
+        damage_data = spell_damage(spell)
         damage_data_list.append(format_damage_columns(damage_data))
 
     max_dmg_length = max(len(data[0]) for data in damage_data_list)
@@ -808,6 +875,211 @@ def output_spells(filtered_spells: list):
     print(f"\n{len(filtered_spells)} spells matched.")
 
 
+def build_parser():
+    """Command line options"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Filter D&D Spells")
+
+    parser.add_argument("--class", dest="char_class", type=str, help="class")
+    parser.add_argument("--level", type=int, help="spell level")
+    parser.add_argument(
+        "-nc", "--noncombat", action="store_true", help="non-combat spells"
+    )
+    parser.add_argument(
+        "-nc1",
+        "--noncombat-minute",
+        action="store_true",
+        help="1 min cast non-combat spells",
+    )
+    parser.add_argument(
+        "-c", "--combat", action="store_true", help="combat casting time spells"
+    )
+    parser.add_argument("-f", "--file", type=str, help="load character.json")
+    parser.add_argument(
+        "-r", "--range", type=int, help="filter by minimum range in feet"
+    )
+    parser.add_argument(
+        "-s",
+        "--sort",
+        choices=["name", "level", "school", "range", "damage", "healing"],
+        default="name",
+        help="sort by name, level, school, range, damage, or healing",
+    )
+    parser.add_argument(
+        "-u",
+        "--unprepared",
+        action="store_true",
+        help="include unprepared spells (default: prepared only)",
+    )
+    parser.add_argument("-n", "--name", type=str, help="filter by spell name prefix")
+    parser.add_argument(
+        "-w",
+        "--where",
+        type=str,
+        help='filter expression, e.g. "concentration = false and range_feet >= 60"',
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and re-filter whenever the data files change",
+    )
+    parser.add_argument(
+        "-t",
+        "--tag",
+        action="append",
+        help="damage type, condition or category "
+        "(damage, heal, buff, debuff, control); repeat to require several",
+    )
+    parser.add_argument(
+        "--save",
+        action="append",
+        choices=[
+            "strength",
+            "dexterity",
+            "constitution",
+            "intelligence",
+            "wisdom",
+            "charisma",
+        ],
+        help="saving throw ability",
+    )
+    parser.add_argument(
+        "--castable",
+        action="store_true",
+        help="only spells the character can cast right now (see character.py)",
+    )
+    parser.add_argument(
+        "--no-snapshot",
+        action="store_true",
+        help="don't read or write the startup snapshot of parsed spells",
+    )
+    return parser
+
+
+def main():
+    """Parse options, load data and print the matching spells"""
+    global args, store, character, where_predicate, castable_ids
+    args = build_parser().parse_args()
+
+    store = open_store(
+        args.file if args.file else "characters.json",
+        None if args.no_snapshot else SNAPSHOT_FILE,
+    )
+    apply_snapshot(store.snapshot)
+
+    if not args.char_class and not args.level:
+        # Load characters.json by default if no class/level specified
+        character = select_character(snapshot.characters)
+
+        if character:
+            max_spell_level = use_character(character)
+            print(
+                f"Using character: {character['name']} ({character['class']} {character['level']}, +{spellcasting_mod} spell mod, max spell level {max_spell_level})"
+            )
+        else:
+            print("No character selected. Use --help to see filtering options.")
+            sys.exit(0)
+    elif args.char_class and args.level is not None:
+        # Manual class/level specified - still check if they can cast spells
+        fake_character = {"class": args.char_class, "level": args.level}
+        max_spell_level = get_max_spell_level(fake_character, classes_data)
+
+        # Update the level filter to the actual max castable level
+        original_level = args.level
+        args.level = max_spell_level
+
+        if max_spell_level == -1:
+            print(f"Using {args.char_class} level {original_level}: no spellcasting")
+        elif max_spell_level == 0:
+            print(f"Using {args.char_class} level {original_level}: cantrips only")
+        else:
+            print(
+                f"Using {args.char_class} level {original_level}: max spell level {max_spell_level}"
+            )
+
+        if max_spell_level == -1:
+            print(f"{args.char_class} level {original_level} cannot cast any spells")
+            print("No spells matched the filters.")
+            sys.exit(0)
+    elif args.char_class or args.level is not None:
+        print(
+            "Both --class and --level must be specified together, or use character selection."
+        )
+        sys.exit(1)
+
+    if args.name and not name_ids:
+        suggestions = name_index.suggest(args.name)
+        if suggestions:
+            print(
+                f"No spell named '{args.name}'. Did you mean: {', '.join(suggestions)}?"
+            )
+        else:
+            print(f"No spell named '{args.name}'.")
+        sys.exit(0)
+
+    if args.tag:
+        from spell_index import edit_distance
+        from spell_tags import TagIndex
+
+        for tag in args.tag:
+            if tag.lower() not in TagIndex.known_tags():
+                close = sorted(
+                    (edit_distance(tag.lower(), known), known)
+                    for known in TagIndex.known_tags()
+                )
+                print(f"Unknown tag '{tag}'. Did you mean: {close[0][1]}?")
+                sys.exit(1)
+
+    if args.castable:
+        if not character:
+            print("--castable needs a character from characters.json")
+            sys.exit(1)
+        if args.watch:
+            from character import session_log_file
+
+            store.watch_file(session_log_file(character))
+        try:
+            castable_ids = castable_spells(character)
+        except ValueError as e:
+            print(f"Can't restore {character['name']}'s session: {e}")
+            sys.exit(1)
+
+    if args.where:
+        from spell_query import QueryError, compile_where
+
+        try:
+            where_predicate = compile_where(args.where, query_fields(spells))
+        except QueryError as e:
+            print(f"Invalid --where expression: {e}")
+            sys.exit(1)
+
+    if args.watch:
+        try:
+            snapshots = store.watch()
+            next(snapshots)  # the snapshot already applied
+            output_spells(filter_spells())
+            store.save()
+            for reloaded in snapshots:
+                if reloaded is not snapshot:
+                    apply_snapshot(reloaded)
+                    print(
+                        f"\nReloaded data (version {snapshot.version}, {store.changed_spells} spells changed)"
+                    )
+                elif castable_ids is not None:
+                    # Only the session log changed
+                    refresh_castable()
+                    print(f"\nReloaded {character['name']}'s session")
+                output_spells(filter_spells())
+                store.save()
+        except KeyboardInterrupt:
+            pass
+    else:
+        filtered_spells_for_printing = filter_spells()
+        output_spells(filtered_spells_for_printing)
+        # Keep the analysis done for this run for the next one
+        store.save()
+
+
 if __name__ == "__main__":
-    filtered_spells_for_printing = filter_spells()
-    output_spells(filtered_spells_for_printing)
+    main()
@@ -0,0 +1,151 @@
+"""Spell name index: normalized lookup, prefix search and typo suggestions"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def normalize_title(title: str) -> str:
+    """Normalize a spell title for lookup (case, punctuation, whitespace)."""
+    title = title.lower().replace("’", "'")
+    title = re.sub(r"[^a-z0-9' ]+", " ", title)
+    return " ".join(title.split())
+
+
+def edit_distance(a: str, b: str, limit: int = None) -> int:
+    """
+    Levenshtein distance between two strings.
+    If limit is given, stop early and return limit + 1 once it is exceeded.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[j] + 1,  # deletion
+                    current[j - 1] + 1,  # insertion
+                    previous[j - 1] + (char_a != char_b),  # substitution
+                )
+            )
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TitleTrie:
+    """Prefix tree over normalized spell titles"""
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key: str, spell_id: int):
+        node = self.root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(spell_id)
+
+    def complete(self, prefix: str) -> List[int]:
+        """Return ids of all spells whose normalized title starts with prefix."""
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        found = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char is None:
+                    found.extend(child)
+                else:
+                    stack.append(child)
+        return sorted(found)
+
+
+class SpellNameIndex:
+    """Name index built once per spell corpus"""
+
+    def __init__(self, spells: List[dict]):
+        self.spells = spells
+        self.ids: Dict[str, int] = {}
+        self.trie = TitleTrie()
+        for spell_id, spell in enumerate(spells):
+            key = normalize_title(spell.get("title", ""))
+            if key not in self.ids:
+                self.ids[key] = spell_id
+            self.trie.insert(key, spell_id)
+
+    def lookup(self, title: str):
+        """Return the spell id for an exact (normalized) title, or None."""
+        return self.ids.get(normalize_title(title))
+
+    def complete(self, prefix: str) -> List[int]:
+        """Return spell ids whose title starts with prefix."""
+        return self.trie.complete(normalize_title(prefix))
+
+    def suggest(self, title: str, max_results: int = 3) -> List[str]:
+        """Suggest the closest spell titles for a name that didn't match."""
+        key = normalize_title(title)
+        if not key:
+            return []
+        # Never allow as many edits as the key has characters, or a one or two
+        # letter name would "match" every short title
+        limit = min(max(1, len(key) // 3), len(key) - 1)
+
+        # A truncated name is the likeliest mistake, so completions come
+        # first (shortest first), then the closest titles by edit distance
+        completions = sorted(
+            self.complete(title),
+            key=lambda spell_id: (len(self.spells[spell_id]["title"]), spell_id),
+        )
+        suggestions = completions[:max_results]
+
+        scored = []
+        for candidate, spell_id in self.ids.items():
+            if spell_id in suggestions:
+                continue
+            distance = edit_distance(key, candidate, limit)
+            if distance <= limit:
+                scored.append((distance, candidate, spell_id))
+        scored.sort()
+        suggestions += [spell_id for _, _, spell_id in scored]
+
+        return [
+            self.spells[spell_id]["title"] for spell_id in suggestions[:max_results]
+        ]
+
+    def resolve(self, titles: Iterable[str]) -> Tuple[Set[int], Dict[str, List[str]]]:
+        """
+        Resolve a list of spell titles to spell ids.
+        Returns (ids, unknown) where unknown maps each unmatched title
+        to a list of suggested titles.
+        """
+        ids = set()
+        unknown = {}
+        for title in titles:
+            spell_id = self.lookup(title)
+            if spell_id is None:
+                unknown[title] = self.suggest(title)
+            else:
+                ids.add(spell_id)
+        return ids, unknown
+
+
+def report_unknown_spells(unknown: Dict[str, List[str]], source: str):
+    """Print a warning for each unmatched spell name, with suggestions."""
+    for title, suggestions in unknown.items():
+        if suggestions:
+            hint = ", ".join(suggestions)
+            print(
+                f"Warning: unknown spell '{title}' in {source} (did you mean: {hint}?)"
+            )
+        else:
+            print(f"Warning: unknown spell '{title}' in {source}")
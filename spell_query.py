@@ -0,0 +1,301 @@
+"""
+--where expression language for spell filtering
+
+Example:
+    concentration = false and school in (Evocation, Necromancy)
+        and damage_type has fire and range_feet >= 60
+
+Expressions are parsed once, checked against the spell schema and compiled
+into a single predicate function, so nothing is re-interpreted per spell.
+"""
+
+import operator
+import re
+from typing import Callable, Dict, List, NamedTuple
+
+from spell_index import edit_distance
+
+# Field kinds
+BOOL = "bool"
+NUMBER = "number"
+TEXT = "text"
+LIST = "list"
+ANY = "any"  # mixed values in the corpus, e.g. range_distance
+
+
+class QueryError(ValueError):
+    """Raised for a --where expression that can't be parsed or validated"""
+
+
+class QueryField(NamedTuple):
+    """A field that can be used in a --where expression"""
+
+    kind: str
+    getter: Callable[[dict], object]
+
+
+def spell_field(key: str, kind: str) -> QueryField:
+    """Field read straight from the spell dict"""
+    return QueryField(kind, lambda spell: spell.get(key))
+
+
+def infer_kind(values: List) -> str:
+    """Work out the kind of a spell field from the values in the corpus"""
+    present = [v for v in values if v is not None]
+    if not present:
+        return ANY
+    if all(isinstance(v, bool) for v in present):
+        return BOOL
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return NUMBER
+    if all(isinstance(v, str) for v in present):
+        return TEXT
+    return ANY
+
+
+def spell_schema(spells: List[dict]) -> Dict[str, QueryField]:
+    """Build query fields for every key in the spell corpus"""
+    keys = {}
+    for spell in spells:
+        for key, value in spell.items():
+            keys.setdefault(key, []).append(value)
+    return {key: spell_field(key, infer_kind(values)) for key, values in keys.items()}
+
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)(?![\w'])
+      | (?P<string>"[^"]*"|'[^']*')
+      | (?P<op><=|>=|!=|==|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<word>[A-Za-z_][\w'-]*)
+    )""",
+    re.VERBOSE,
+)
+
+KEYWORDS = {"and", "or", "not", "in", "has"}
+LITERALS = {"true": True, "false": False, "null": None, "none": None}
+
+COMPARISONS = {
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def tokenize(text: str) -> List[tuple]:
+    """Split an expression into (kind, value) tokens"""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_PATTERN.match(text, pos)
+        if not match:
+            raise QueryError(f"Unexpected character at position {pos}: {text[pos:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "string":
+            value = value[1:-1]
+        elif kind == "word" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser producing a nested tuple AST"""
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None:
+            raise QueryError("Unexpected end of expression")
+        if (kind and token[0] != kind) or (value is not None and token[1] != value):
+            expected = value if value is not None else kind
+            raise QueryError(f"Expected {expected} but found {token[1]!r}")
+        self.pos += 1
+        return token
+
+    def at(self, kind, value=None) -> bool:
+        token = self.peek()
+        return token[0] == kind and (value is None or token[1] == value)
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise QueryError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.at("keyword", "or"):
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.at("keyword", "and"):
+            self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.at("keyword", "not"):
+            self.take()
+            return ("not", self.parse_not())
+        if self.at("punct", "("):
+            self.take()
+            node = self.parse_or()
+            self.take("punct", ")")
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        field = self.take("word")[1]
+        if self.at("op"):
+            op = self.take()[1]
+            return ("compare", field, op, self.parse_value())
+        if self.at("keyword", "in"):
+            self.take()
+            self.take("punct", "(")
+            values = [self.parse_value()]
+            while self.at("punct", ","):
+                self.take()
+                values.append(self.parse_value())
+            self.take("punct", ")")
+            return ("in", field, values)
+        if self.at("keyword", "has"):
+            self.take()
+            return ("has", field, self.parse_value())
+        raise QueryError(f"Expected an operator after {field!r}")
+
+    def parse_value(self):
+        kind, value = self.peek()
+        if kind in ("number", "string"):
+            self.take()
+            return value
+        if kind == "word":
+            # Bare words run together until the next keyword or punctuation,
+            # so `casting_time_combat_unit = bonus action` works unquoted
+            words = []
+            while self.at("word"):
+                words.append(self.take()[1])
+            text = " ".join(words)
+            return LITERALS.get(text.lower(), text)
+        if kind is None:
+            raise QueryError("Unexpected end of expression")
+        raise QueryError(f"Expected a value but found {value!r}")
+
+
+def fold(value):
+    """Case-fold text so comparisons are case-insensitive"""
+    return value.lower() if isinstance(value, str) else value
+
+
+def check_literal(field: str, kind: str, value):
+    """Make sure a literal makes sense for the field it's compared with"""
+    if value is None or kind == ANY:
+        return
+    if kind == BOOL and not isinstance(value, bool):
+        raise QueryError(f"{field} is true/false, not {value!r}")
+    if kind == NUMBER and (
+        isinstance(value, bool) or not isinstance(value, (int, float))
+    ):
+        raise QueryError(f"{field} is a number, not {value!r}")
+    if kind in (TEXT, LIST) and not isinstance(value, str):
+        raise QueryError(f"{field} is text, not {value!r}")
+
+
+def lookup_field(fields: Dict[str, QueryField], name: str) -> QueryField:
+    if name in fields:
+        return fields[name]
+    close = sorted(
+        (0 if known.startswith(name) else edit_distance(name, known), known)
+        for known in fields
+    )
+    hint = [known for distance, known in close[:3] if distance <= 3]
+    message = f"Unknown field {name!r}"
+    if hint:
+        message += f" (did you mean: {', '.join(hint)}?)"
+    raise QueryError(message)
+
+
+def compile_node(node, fields: Dict[str, QueryField]) -> Callable[[dict], bool]:
+    """Turn an AST node into a predicate function"""
+    kind = node[0]
+
+    if kind in ("and", "or"):
+        predicates = [compile_node(child, fields) for child in node[1]]
+        if kind == "and":
+            return lambda spell: all(p(spell) for p in predicates)
+        return lambda spell: any(p(spell) for p in predicates)
+
+    if kind == "not":
+        predicate = compile_node(node[1], fields)
+        return lambda spell: not predicate(spell)
+
+    name = node[1]
+    field = lookup_field(fields, name)
+    getter = field.getter
+
+    if kind == "compare":
+        _, _, op, value = node
+        check_literal(name, field.kind, value)
+        if field.kind == LIST:
+            raise QueryError(f"{name} is a list; use `{name} has ...`")
+        if op not in ("=", "==", "!=") and (value is None or isinstance(value, bool)):
+            raise QueryError(f"Can't use {op} with {value!r}")
+        compare = COMPARISONS[op]
+        value = fold(value)
+        if op in ("=", "==", "!="):
+            return lambda spell: compare(fold(getter(spell)), value)
+
+        def ordered(spell):
+            actual = fold(getter(spell))
+            if actual is None or type(actual) is bool:
+                return False
+            if isinstance(actual, str) != isinstance(value, str):
+                return False
+            return compare(actual, value)
+
+        return ordered
+
+    if kind == "in":
+        if field.kind == LIST:
+            raise QueryError(f"{name} is a list; use `{name} has ...`")
+        for value in node[2]:
+            check_literal(name, field.kind, value)
+        values = frozenset(fold(value) for value in node[2])
+        return lambda spell: fold(getter(spell)) in values
+
+    if kind == "has":
+        if field.kind != LIST:
+            raise QueryError(f"`has` only works on list fields, and {name} isn't one")
+        value = node[2]
+        check_literal(name, field.kind, value)
+        value = fold(value)
+        return lambda spell: value in (fold(item) for item in getter(spell) or ())
+
+    raise QueryError(f"Unknown expression {node!r}")
+
+
+def compile_where(text: str, fields: Dict[str, QueryField]) -> Callable[[dict], bool]:
+    """Parse and validate a --where expression, returning a spell predicate"""
+    return compile_node(Parser(text).parse(), fields)
@@ -0,0 +1,362 @@
+"""
+Reloadable spell, class and character data for long-running processes
+
+A SpellStore holds an immutable Snapshot of everything loaded from disk.
+When a file changes only that part is rebuilt: a character edit doesn't
+touch the spell corpus, and a spell edit only re-analyzes the spells whose
+content actually changed. The new Snapshot replaces the old one in a single
+assignment, so a query that grabbed `store.snapshot` keeps a consistent view.
+
+Spell analysis is lazy: a spell is analyzed the first time it's displayed
+or queried, and tags (and the tag index) only when something asks for them.
+The parsed corpus and whatever analysis has been computed can be pickled to
+a startup snapshot file, so later processes skip that work while spells.json
+and the analysis code are unchanged.
+"""
+
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, NamedTuple, Set, Tuple
+
+from spell_index import SpellNameIndex
+from spell_tags import TagIndex
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # optional, fall back to polling
+    INotify = None
+
+SPELLS = "spells"
+CLASSES = "classes"
+CHARACTERS = "characters"
+
+# Bump when the pickled layout changes
+SNAPSHOT_FORMAT = 4
+
+
+class SpellAnalysis:
+    """Per-spell analysis for one spell corpus, computed on first use"""
+
+    def __init__(
+        self,
+        spells: List[dict],
+        analyze: Callable[[dict], dict],
+        tag: Callable[[dict, dict], dict],
+        results: Dict[str, dict] = None,
+    ):
+        """
+        analyze(spell) returns a spell's analysis, and tag(spell, analysis)
+        its tags, which are stored in the analysis under "tags".
+        results maps spell title to analysis already computed.
+        """
+        self.spells = spells
+        self.analyze = analyze
+        self.tag = tag
+        self.results = results if results is not None else {}
+        self.computed = 0  # analyses and tags computed since the last save
+        self._tag_index = None
+
+    def get(self, spell: dict) -> dict:
+        title = spell.get("title")
+        result = self.results.get(title)
+        if result is None:
+            result = self.results[title] = self.analyze(spell)
+            self.computed += 1
+        return result
+
+    def tags(self, spell: dict) -> dict:
+        result = self.get(spell)
+        if "tags" not in result:
+            result["tags"] = self.tag(spell, result)
+            self.computed += 1
+        return result["tags"]
+
+    def tag_index(self) -> TagIndex:
+        """Tag index over the whole corpus, built the first time it's needed"""
+        if self._tag_index is None:
+            for spell in self.spells:
+                self.tags(spell)
+            self._tag_index = TagIndex(self.spells, self.results)
+        return self._tag_index
+
+
+class Snapshot(NamedTuple):
+    """Consistent view of all loaded data"""
+
+    version: int
+    spells: List[dict]
+    name_index: SpellNameIndex
+    analysis: SpellAnalysis
+    classes: List[dict]
+    characters: List[dict]
+
+
+def file_signature(filename: str):
+    """(mtime, size) of a file, or None if it doesn't exist"""
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SpellStore:
+    """Loads data files and rebuilds only what changed when they're edited"""
+
+    def __init__(
+        self,
+        sources: Dict[str, Tuple[str, Callable[[str], list]]],
+        analyze: Callable[[dict], dict],
+        tag: Callable[[dict, dict], dict],
+        snapshot_file: str = None,
+    ):
+        """
+        sources maps SPELLS/CLASSES/CHARACTERS to (filename, loader), where
+        loader(filename) returns the parsed file contents.
+        analyze and tag compute Snapshot.analysis (see SpellAnalysis).
+        snapshot_file, if given, caches the spell corpus between runs.
+        """
+        self.sources = sources
+        self.analyze = analyze
+        self.tag = tag
+        self.snapshot_file = snapshot_file
+        self.signatures = {}  # source -> file signature it was last loaded from
+        self.failed = {}  # source -> file signature that failed to load
+        self.watched = {}  # extra watched file -> signature when last seen
+        self.snapshot = None
+        self.spells_key = None  # startup snapshot key of the loaded corpus
+        self.unsaved = False  # corpus isn't in the startup snapshot yet
+        self.changed_spells = 0
+        self.reload(set(sources))
+
+    def reload(self, changed: Set[str]) -> Snapshot:
+        """
+        Rebuild the parts of the snapshot backed by the changed sources.
+        Sources that load are applied even when another one fails (e.g. a
+        half-written spells.json); the first failure is then re-raised and
+        that source is retried once its file changes again.
+        """
+        self.changed_spells = 0
+        loaded = {}
+        errors = []
+        for key in sorted(changed):
+            signature = file_signature(self.sources[key][0])
+            try:
+                if key == SPELLS:
+                    loaded[key] = self.load_spells()
+                else:
+                    loaded[key] = self.load(key)
+            except (OSError, ValueError) as e:
+                self.failed[key] = signature
+                errors.append(e)
+                continue
+            self.signatures[key] = signature
+            self.failed.pop(key, None)
+
+        old = self.snapshot
+        if errors and old is None:
+            raise errors[0]  # nothing to fall back on
+        if loaded:
+            if SPELLS in loaded:
+                spells, name_index, analysis = loaded[SPELLS]
+            else:
+                spells, name_index = old.spells, old.name_index
+                analysis = old.analysis
+
+            self.snapshot = Snapshot(
+                version=old.version + 1 if old else 1,
+                spells=spells,
+                name_index=name_index,
+                analysis=analysis,
+                classes=loaded[CLASSES] if CLASSES in loaded else old.classes,
+                characters=(
+                    loaded[CHARACTERS] if CHARACTERS in loaded else old.characters
+                ),
+            )
+        if errors:
+            raise errors[0]
+        return self.snapshot
+
+    def load(self, key: str):
+        filename, loader = self.sources[key]
+        return loader(filename)
+
+    def load_spells(self) -> tuple:
+        """
+        Load the spell corpus and build its name index, from the startup
+        snapshot when it's current. Returns (spells, name_index, analysis).
+        """
+        key = self.startup_key()
+        cached = self.read_startup_snapshot(key)
+        if cached:
+            spells, name_index, results = cached
+            unsaved = False
+        else:
+            spells = self.load(SPELLS)
+            name_index = SpellNameIndex(spells)
+            results = self.unchanged_results(spells)
+            unsaved = True
+        self.spells_key, self.unsaved = key, unsaved
+        analysis = SpellAnalysis(spells, self.analyze, self.tag, results)
+        return spells, name_index, analysis
+
+    def unchanged_results(self, spells: List[dict]) -> Dict[str, dict]:
+        """Analysis from the current snapshot for spells that weren't edited"""
+        if self.snapshot is None:
+            return {}
+        old = self.snapshot.analysis
+        old_spells = {spell.get("title"): spell for spell in old.spells}
+        results = {}
+        for spell in spells:
+            title = spell.get("title")
+            if old_spells.get(title) != spell:
+                self.changed_spells += 1
+            elif title in old.results:
+                results[title] = old.results[title]
+        return results
+
+    def startup_key(self) -> tuple:
+        """
+        Identifies what a startup snapshot was built from: spells.json plus
+        the files holding the analysis and index code. Files rather than
+        module names, since filter.py is "__main__" when run directly.
+        """
+        files = {
+            os.path.abspath(self.analyze.__code__.co_filename),
+            os.path.abspath(self.tag.__code__.co_filename),
+            sys.modules[SpellNameIndex.__module__].__file__,
+            sys.modules[TagIndex.__module__].__file__,
+        }
+        return (
+            SNAPSHOT_FORMAT,
+            file_signature(self.sources[SPELLS][0]),
+            tuple(sorted((name, file_signature(name)) for name in files)),
+        )
+
+    def save(self):
+        """
+        Write the startup snapshot if the corpus or its analysis has changed
+        since it was last read or written.
+        """
+        analysis = self.snapshot.analysis
+        if not self.unsaved and not analysis.computed:
+            return
+        data = (self.snapshot.spells, self.snapshot.name_index, analysis.results)
+        self.write_startup_snapshot(self.spells_key, data)
+        self.unsaved = False
+        analysis.computed = 0
+
+    def read_startup_snapshot(self, key: tuple):
+        if not self.snapshot_file:
+            return None
+        import pickle
+
+        try:
+            with open(self.snapshot_file, "rb") as f:
+                cached_key, data = pickle.load(f)
+        except Exception:  # missing, stale format or corrupt: just rebuild
+            return None
+        return data if cached_key == key else None
+
+    def write_startup_snapshot(self, key: tuple, data: tuple):
+        if not self.snapshot_file:
+            return
+        import pickle
+
+        temp_file = f"{self.snapshot_file}.tmp"
+        try:
+            with open(temp_file, "wb") as f:
+                pickle.dump((key, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, self.snapshot_file)
+        except OSError:
+            pass  # a read-only checkout just doesn't get a snapshot
+
+    def watch_file(self, filename: str):
+        """
+        Also watch a file the caller reads itself (e.g. a session log):
+        when it changes, watch() yields the current snapshot again.
+        """
+        self.watched[filename] = file_signature(filename)
+
+    def changed_files(self) -> Set[str]:
+        """Extra watched files that changed since they were last seen"""
+        changed = set()
+        for filename, signature in self.watched.items():
+            if file_signature(filename) != signature:
+                changed.add(filename)
+        return changed
+
+    def changed_sources(self) -> Set[str]:
+        """Sources whose file has changed since it was last loaded"""
+        changed = set()
+        for key, (filename, _) in self.sources.items():
+            signature = file_signature(filename)
+            # A file that failed to load is retried only once it changes again
+            if signature not in (self.signatures.get(key), self.failed.get(key)):
+                changed.add(key)
+        return changed
+
+    def wait_for_change(self, interval: float = 1.0) -> Set[str]:
+        """
+        Block until a source or watch_file() file changes; returns the
+        changed sources
+        """
+        if INotify is None:
+            return self.poll_for_change(interval)
+
+        inotify = INotify()
+        watch_flags = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE | flags.DELETE
+        # Watch directories rather than files so editors that save by
+        # renaming a temp file over the original are still noticed
+        names = set()
+        directories = set()
+        filenames = [filename for filename, _ in self.sources.values()]
+        for filename in filenames + list(self.watched):
+            names.add(os.path.basename(filename))
+            directories.add(os.path.dirname(os.path.abspath(filename)))
+        for directory in directories:
+            inotify.add_watch(directory, watch_flags)
+        try:
+            while True:
+                # Catch anything written between the last reload and now
+                changed = self.changed_sources()
+                if changed or self.changed_files():
+                    return changed
+                for event in inotify.read():
+                    if event.name in names:
+                        time.sleep(0.05)  # let the writer finish
+                        break
+        finally:
+            inotify.close()
+
+    def poll_for_change(self, interval: float) -> Set[str]:
+        while True:
+            changed = self.changed_sources()
+            if changed or self.changed_files():
+                return changed
+            time.sleep(interval)
+
+    def watch(self, interval: float = 1.0) -> Iterator[Snapshot]:
+        """
+        Yield the current snapshot, then a new one each time a file changes,
+        or the same one again when only a file from watch_file() changed.
+        A file that fails to load (e.g. half-written JSON) keeps the old data.
+        """
+        yield self.snapshot
+        while True:
+            changed = self.wait_for_change(interval)
+            files_changed = self.changed_files()
+            for filename in files_changed:
+                self.watched[filename] = file_signature(filename)
+
+            snapshot = self.snapshot
+            if changed:
+                try:
+                    self.reload(changed)
+                except (OSError, ValueError) as e:
+                    failed = sorted(changed.intersection(self.failed))
+                    files = ", ".join(self.sources[key][0] for key in failed)
+                    print(f"Failed to reload {files}: {e}")
+            if self.snapshot is not snapshot or files_changed:
+                yield self.snapshot
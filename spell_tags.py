@@ -0,0 +1,228 @@
+"""
+Spell tagging: damage types, conditions, saving throws and effect categories
+
+Tags are extracted once per spell when the corpus is built and kept in an
+inverted index (tag -> spell ids), so `--tag restrained --save wisdom` is a
+set intersection rather than a scan over every description.
+"""
+
+import re
+from typing import Dict, Iterable, List, Set
+
+DAMAGE_TYPES = [
+    "acid",
+    "bludgeoning",
+    "cold",
+    "fire",
+    "force",
+    "lightning",
+    "necrotic",
+    "piercing",
+    "poison",
+    "psychic",
+    "radiant",
+    "slashing",
+    "thunder",
+]
+
+CONDITIONS = [
+    "blinded",
+    "charmed",
+    "deafened",
+    "frightened",
+    "grappled",
+    "incapacitated",
+    "invisible",
+    "paralyzed",
+    "petrified",
+    "poisoned",
+    "prone",
+    "restrained",
+    "stunned",
+    "unconscious",
+]
+
+# Conditions that take away a creature's options, as opposed to e.g. invisible
+CONTROL_CONDITIONS = {
+    "blinded",
+    "charmed",
+    "frightened",
+    "grappled",
+    "incapacitated",
+    "paralyzed",
+    "petrified",
+    "prone",
+    "restrained",
+    "stunned",
+    "unconscious",
+}
+
+ABILITIES = [
+    "strength",
+    "dexterity",
+    "constitution",
+    "intelligence",
+    "wisdom",
+    "charisma",
+]
+
+CATEGORIES = ["damage", "heal", "buff", "debuff", "control"]
+
+_damage_type = "|".join(DAMAGE_TYPES)
+
+# A damage type, or a list of them ("acid, cold, or fire"), optionally
+# followed by "damage". A lone word only counts when "damage" follows, so
+# "fire" in "set fire to" or "force" in "an elemental force" is ignored,
+# while a list of choices ("choose acid, cold, or fire") counts either way.
+DAMAGE_TYPE_RUN = re.compile(
+    rf"\b(?:{_damage_type})\b"
+    rf"(?:(?:,\s*(?:or\s+|and\s+)?|\s+(?:or|and)\s+)(?:{_damage_type})\b)*"
+    r"(?P<damage>,?\s+damage\b)?",
+    re.IGNORECASE,
+)
+DAMAGE_TYPE_WORD = re.compile(rf"\b(?:{_damage_type})\b", re.IGNORECASE)
+# "immune to thunder damage", "can't ... deal thunder damage" name a damage
+# type without dealing it
+NO_DAMAGE = re.compile(
+    r"(?:\b(?:immun(?:e|ity)|resistan(?:ce|t)|vulnerab(?:le|ility))\s+to"
+    r"|\b(?:can't|cannot|can’t)\b[^.]*\bdeal)\s+(?:\w+\s+)?$",
+    re.IGNORECASE,
+)
+
+INFLICTED_CONDITION = re.compile(
+    r"\b(?:be|is|are|become|becomes|fall|falls|knocked|knocks?|left|remains?)"
+    rf"\s+(?:\w+\s+){{0,2}}?({'|'.join(CONDITIONS)})\b",
+    re.IGNORECASE,
+)
+# "can't be charmed", "immune to being frightened" protect rather than inflict,
+# "if the target is already charmed" or "isn't knocked unconscious" describe
+# a state rather than cause it, and "you are blinded" is a cost to the caster
+PROTECTED_CONDITION = re.compile(
+    r"(?:\b(?:can't|cannot|can’t|immune|against|already|no longer|not|isn't"
+    r"|aren't|isn’t|aren’t|you are|if (?:the |a |an )?\w+ (?:is|are))"
+    r"|\bsuppress\w*\b[^.,;]*)\s+(?:\w+\s+){0,2}$",
+    re.IGNORECASE,
+)
+
+SAVING_THROW = re.compile(rf"\b({'|'.join(ABILITIES)})\s+saving throw", re.IGNORECASE)
+
+HEALING = re.compile(r"\bregains?\b[^.]*?\bhit points\b", re.IGNORECASE)
+NO_HEALING = re.compile(r"\b(?:can't|cannot|can’t|doesn't)\s+regain", re.IGNORECASE)
+BUFF = re.compile(
+    r"\badvantage on\b|\bbonus to\b|\btemporary hit points\b|\bresistance to\b"
+    r"|\bimmun(?:e|ity) to\b|(?-i:\bAC\b)|\bspeed increases\b|\badd (?:a )?\dd\d\b"
+    r"|\broll a d\d+ and add\b|\bhit point maximum\b[^.]*?\bincreases?\b"
+    r"|\b(?:have|any creature has) disadvantage on attack rolls against"
+    r" (?:you|the target)\b",
+    re.IGNORECASE,
+)
+# Creatures shrugging the spell off, or a penalty, read like buffs to BUFF
+NOT_BUFF = re.compile(
+    r"\bimmun(?:e|ity) to (?:this|being|the spell|its effects?)\b"
+    r"|\badvantage on (?:the|its) (?:saving throw|save)\b"
+    r"|\byou have advantage on the attack roll\b"
+    r"|\bpenalty to (?-i:AC)\b",
+    re.IGNORECASE,
+)
+DEBUFF = re.compile(
+    r"\bdisadvantage on\b|\bsubtract\b|\bvulnerab|\bpenalty\b"
+    r"|\bloses any resistance\b|\bcan't regain hit points\b"
+    r"|\bspeed is (?:halved|reduced)\b|\bspeed reduced\b"
+    r"|\battack rolls?(?: made)? against [^.]*?\bha(?:s|ve) advantage\b"
+    r"|\bcan(?:'|’)t benefit from\b|\bdeals? only half damage\b",
+    re.IGNORECASE,
+)
+CONTROL = re.compile(
+    r"\bpushed\b|\bpulled\b|\bcan't move\b|\bspeed (?:is|becomes) 0\b",
+    re.IGNORECASE,
+)
+
+
+def find_damage_types(text: str) -> List[str]:
+    """Damage types a description deals, in order of first mention"""
+    found = []
+    for match in DAMAGE_TYPE_RUN.finditer(text):
+        if NO_DAMAGE.search(text[max(0, match.start() - 150) : match.start()]):
+            continue
+        types = DAMAGE_TYPE_WORD.findall(match.group(0))
+        if match.group("damage") or len(types) > 1:
+            found.extend(damage_type.lower() for damage_type in types)
+    return list(dict.fromkeys(found))
+
+
+def find_conditions(text: str) -> List[str]:
+    """Conditions a description inflicts, in order of first mention"""
+    found = []
+    for match in INFLICTED_CONDITION.finditer(text):
+        if not PROTECTED_CONDITION.search(
+            text[max(0, match.start() - 40) : match.start(1)]
+        ):
+            found.append(match.group(1).lower())
+    return list(dict.fromkeys(found))
+
+
+def find_saves(text: str) -> List[str]:
+    """Abilities used for saving throws against the spell"""
+    return list(dict.fromkeys(a.lower() for a in SAVING_THROW.findall(text)))
+
+
+def tag_description(description: str, analysis: Dict) -> Dict[str, List[str]]:
+    """
+    Tag a spell description. `analysis` is the description's damage analysis
+    (damage_types and expressions), so damage and healing aren't re-parsed.
+    """
+    conditions = find_conditions(description)
+
+    categories = []
+    expressions = analysis["expressions"]
+    if analysis["damage_types"] or any(e[2] for e in expressions):
+        categories.append("damage")
+    # Temporary hit points are a buff, not healing
+    if any(not e[2] and "temporary" not in e[1] for e in expressions) or (
+        HEALING.search(description) and not NO_HEALING.search(description)
+    ):
+        categories.append("heal")
+    if BUFF.search(NOT_BUFF.sub(" ", description)):
+        categories.append("buff")
+    if DEBUFF.search(description):
+        categories.append("debuff")
+    if CONTROL.search(description) or CONTROL_CONDITIONS.intersection(conditions):
+        categories.append("control")
+
+    return {
+        "damage_types": list(analysis["damage_types"]),
+        "conditions": conditions,
+        "saves": find_saves(description),
+        "categories": categories,
+    }
+
+
+class TagIndex:
+    """Inverted index from tag to spell ids, built once per corpus"""
+
+    def __init__(self, spells: List[dict], analysis: Dict[str, Dict]):
+        """analysis maps spell title to per-spell analysis with a 'tags' entry"""
+        self.tags: Dict[str, Set[int]] = {}
+        self.saves: Dict[str, Set[int]] = {}
+        for spell_id, spell in enumerate(spells):
+            spell_tags = analysis.get(spell.get("title"), {}).get("tags")
+            if not spell_tags:
+                continue
+            for key in ("damage_types", "conditions", "categories"):
+                for tag in spell_tags[key]:
+                    self.tags.setdefault(tag, set()).add(spell_id)
+            for ability in spell_tags["saves"]:
+                self.saves.setdefault(ability, set()).add(spell_id)
+
+    @staticmethod
+    def known_tags() -> List[str]:
+        return DAMAGE_TYPES + CONDITIONS + CATEGORIES
+
+    def select(self, tags: Iterable[str] = (), saves: Iterable[str] = ()) -> Set[int]:
+        """Spell ids carrying every given tag and save (intersection)"""
+        lookups = [self.tags.get(tag.lower(), set()) for tag in tags]
+        lookups += [self.saves.get(ability.lower(), set()) for ability in saves]
+        if not lookups:
+            return set()
+        lookups.sort(key=len)
+        return set(lookups[0]).intersection(*lookups[1:])
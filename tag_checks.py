@@ -0,0 +1,78 @@
+"""Regression checks for the spell tagger
+
+Each check names a spell that has been mis-tagged before and the tag it
+should (or shouldn't) carry, so a change to the patterns in spell_tags.py
+can be checked against the full corpus in one run.
+
+    python tag_checks.py
+"""
+
+import sys
+from typing import List
+
+from filter import analyze_spell, get_spells_json, tag_spell
+
+# (spell, tag group, tag, whether the spell should carry it)
+TAG_CHECKS = [
+    ("Bless", "categories", "buff", True),
+    ("Guidance", "categories", "buff", True),
+    ("Resistance", "categories", "buff", True),
+    ("Aid", "categories", "buff", True),
+    ("Bane", "categories", "buff", False),
+    ("Blur", "categories", "buff", True),
+    ("Sleep", "categories", "buff", False),
+    ("Cause Fear", "categories", "buff", False),
+    ("Tasha's Hideous Laughter", "categories", "buff", False),
+    ("Slow", "categories", "buff", False),
+    ("Shocking Grasp", "categories", "buff", False),
+    ("Slow", "categories", "debuff", True),
+    ("Faerie Fire", "categories", "debuff", True),
+    ("Ray of Enfeeblement", "categories", "debuff", True),
+    ("Enhance Ability", "categories", "heal", False),
+    ("False Life", "categories", "heal", False),
+    ("Cure Wounds", "categories", "heal", True),
+    ("Protection from Evil and Good", "conditions", "charmed", False),
+    ("Power Word: Heal", "conditions", "charmed", False),
+    ("Power Word: Heal", "conditions", "prone", False),
+    ("True Polymorph", "conditions", "unconscious", False),
+    ("Calm Emotions", "conditions", "charmed", False),
+    ("Enthrall", "conditions", "incapacitated", False),
+    ("Project Image", "conditions", "blinded", False),
+    ("Mislead", "conditions", "blinded", False),
+    ("Hold Person", "conditions", "paralyzed", True),
+    ("Sleep", "conditions", "unconscious", True),
+    ("Command", "conditions", "prone", True),
+    ("Silence", "damage_types", "thunder", False),
+    ("Silence", "categories", "damage", False),
+    ("Major Image", "damage_types", "thunder", False),
+    ("Fireball", "damage_types", "fire", True),
+]
+
+
+def check_tags(spells: List[dict]) -> int:
+    """Run TAG_CHECKS against the tagger; return the number that fail"""
+    by_title = {spell["title"]: spell for spell in spells}
+    failures = 0
+    for title, group, tag, expected in TAG_CHECKS:
+        spell = by_title.get(title)
+        if spell is None:
+            print(f"  {title}: not in spells.json")
+            failures += 1
+            continue
+        tags = tag_spell(spell, analyze_spell(spell))[group]
+        if (tag in tags) != expected:
+            wanted = "expected" if expected else "unexpected"
+            print(f"  {title}: {wanted} {group} tag '{tag}' (got {tags})")
+            failures += 1
+    return failures
+
+
+def main():
+    failures = check_tags(get_spells_json())
+    print(f"{len(TAG_CHECKS) - failures}/{len(TAG_CHECKS)} tag checks passed")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()